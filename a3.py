@@ -6,12 +6,18 @@ Main application for the Direct Messaging Chat assignment.
 
 import tkinter as tk
 from tkinter import ttk, scrolledtext, messagebox, simpledialog
+import bisect
 import json
+import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import List, Dict, Set, Optional
+from typing import List, Dict, Set, Tuple, Optional
 from pathlib import Path
 
+# Shared orjson-or-stdlib serialization shim
+from ds_json import dumps as _dumps, loads as _loads
+
 # Import our DirectMessenger class
 from ds_messenger import DirectMessenger, DirectMessage
 
@@ -26,10 +32,43 @@ class DirectMessengerGUI:
         # Initialize DirectMessenger (not connected yet)
         self.messenger = None
         self.connected = False
+        self._auth_inflight = False
         self.current_contact = None
         self.messages: Dict[str, List[DirectMessage]] = {}
+        # Per-contact set of (timestamp, message) keys for O(1) duplicate checks
+        self._msg_keys: Dict[str, Set[Tuple[float, str]]] = {}
         self.contacts: Set[str] = set()
+        # Contacts already inserted into the Treeview (iid == contact)
+        self._tree_contacts: Set[str] = set()
         self.data_file = Path("messenger_data.json")
+
+        # Debounced persistence state
+        self._dirty = False
+        self._flush_pending = False
+
+        # Append-only message log: each new message costs one written
+        # line instead of a full-store rewrite; the log is folded into
+        # the snapshot (data_file) periodically and on shutdown
+        self.log_file = Path("messenger_data.jsonl")
+        self._log_f = None
+        self._log_writes = 0
+
+        # Adaptive poll interval: fast when messages arrive, backs off when idle
+        self._poll_ms = 500
+        self._poll_max = 10000
+
+        # Worker pool so socket round-trips never block the Tk main loop
+        self._io = ThreadPoolExecutor(max_workers=2)
+
+        # Only one background fetch may run at a time
+        self._fetch_inflight = False
+
+        # Track what is already rendered so we only append new messages
+        self._rendered_contact: Optional[str] = None
+        self._rendered_count: Dict[str, int] = {}
+
+        # Cache of formatted timestamps, keyed by raw timestamp
+        self._time_cache: Dict[float, str] = {}
         
         # Configure the main window
         self._setup_ui()
@@ -37,6 +76,9 @@ class DirectMessengerGUI:
         # Load saved data if available
         self._load_data()
         
+        # Snapshot pending log entries on window close
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+
         # Start the periodic message check
         self._check_messages()
     
@@ -79,6 +121,8 @@ class DirectMessengerGUI:
             state='disabled'
         )
         self.chat_display.pack(fill=tk.BOTH, expand=True)
+        self.chat_display.tag_config("incoming", foreground="blue")
+        self.chat_display.tag_config("outgoing", foreground="green")
         
         # Message input
         msg_frame = ttk.Frame(right_panel)
@@ -130,39 +174,50 @@ class DirectMessengerGUI:
         """Handle login button click."""
         username = self.username_entry.get().strip()
         password = self.password_entry.get()
-        
+
         if not username or not password:
             messagebox.showerror("Error", "Username and password are required")
             return
-        
+
+        if self._auth_inflight:
+            return
+        self._auth_inflight = True
+
+        # Connect and authenticate on a worker thread so the window
+        # stays responsive while the server answers
+        future = self._io.submit(
+            DirectMessenger, username=username, password=password)
+        future.add_done_callback(
+            lambda f: self.root.after(0, self._on_auth_result, f, username))
+
+    def _on_auth_result(self, future, username: str):
+        """Finish login on the Tk main thread once authentication is done."""
+        self._auth_inflight = False
         try:
-            # Initialize DirectMessenger with credentials
-            self.messenger = DirectMessenger(
-                username=username,
-                password=password
-            )
-            
+            messenger = future.result()
+
             # Test connection
-            if not self.messenger.token:
+            if not messenger.token:
                 raise ConnectionError("Authentication failed")
-            
+
+            self.messenger = messenger
+
             # Hide login frame
             self.login_frame.pack_forget()
             self.connected = True
-            
+
             # Update UI
             self.root.title(f"Direct Messaging - {username}")
-            
+
             # Load existing messages
             self._load_messages()
-            
+
             # Update contacts list
             self._update_contacts_list()
-            
+
         except Exception as e:
             messagebox.showerror("Login Failed", f"Could not connect: {str(e)}")
-            if self.messenger:
-                self.messenger = None
+            self.messenger = None
     
     def _add_contact(self):
         """Add a new contact to the list."""
@@ -177,14 +232,23 @@ class DirectMessengerGUI:
             self._save_data()
     
     def _update_contacts_list(self):
-        """Update the contacts list in the UI."""
-        # Clear existing items
-        for item in self.contacts_tree.get_children():
-            self.contacts_tree.delete(item)
-        
-        # Add contacts to the treeview
-        for contact in sorted(self.contacts):
-            self.contacts_tree.insert('', 'end', text=contact, values=(contact,))
+        """Update the contacts list in the UI.
+
+        Only contacts not yet shown are inserted (at their sorted
+        position, with iid == contact name); existing rows are left
+        alone instead of clearing and rebuilding the whole tree.
+        """
+        new_contacts = self.contacts - self._tree_contacts
+        if not new_contacts:
+            return
+
+        shown = sorted(self._tree_contacts)
+        for contact in sorted(new_contacts):
+            idx = bisect.bisect_left(shown, contact)
+            self.contacts_tree.insert(
+                '', idx, iid=contact, text=contact, values=(contact,))
+            shown.insert(idx, contact)
+            self._tree_contacts.add(contact)
     
     def _on_contact_select(self, event):
         """Handle contact selection."""
@@ -199,27 +263,125 @@ class DirectMessengerGUI:
         # Display conversation with this contact
         self._display_conversation(self.current_contact)
     
+    # Number of logged messages between automatic snapshots
+    _SNAPSHOT_EVERY = 256
+
+    def _insert_msg(self, contact: str, msg: DirectMessage, log: bool = True) -> None:
+        """Insert a message, keeping the contact's list sorted by timestamp.
+
+        Unless ``log`` is False (used when replaying the log at startup),
+        the message is also appended to the on-disk message log.
+        """
+        msgs = self.messages.setdefault(contact, [])
+        idx = bisect.bisect_right(msgs, msg.timestamp,
+                                  key=lambda m: m.timestamp)
+        msgs.insert(idx, msg)
+        if (contact == self._rendered_contact
+                and idx < self._rendered_count.get(contact, 0)):
+            # The message landed below the rendered tail (e.g. clock
+            # skew between client- and server-stamped timestamps), so
+            # the append-only render path can't place it; force a full
+            # rebuild on the next display
+            self._rendered_contact = None
+        self._msg_keys.setdefault(contact, set()).add(
+            (msg.timestamp, msg.message))
+        if log:
+            self._append_log(contact, msg)
+
+    def _append_log(self, contact: str, msg: DirectMessage) -> None:
+        """Append one message to the JSONL log; O(1) in history size."""
+        try:
+            if self._log_f is None:
+                self._log_f = open(self.log_file, 'a', buffering=1)
+            self._log_f.write(json.dumps({
+                'contact': contact,
+                'recipient': msg.recipient,
+                'sender': msg.sender,
+                'message': msg.message,
+                'timestamp': msg.timestamp
+            }) + '\n')
+        except Exception as e:
+            print(f"Failed to log message: {str(e)}")
+            return
+        self._log_writes += 1
+        if self._log_writes >= self._SNAPSHOT_EVERY:
+            self._snapshot()
+
+    def _snapshot(self):
+        """Write the consolidated store to disk and clear the log."""
+        self._write_data()
+        try:
+            if self._log_f is not None:
+                self._log_f.close()
+            # Reopening in write mode truncates the replayed log
+            self._log_f = open(self.log_file, 'w', buffering=1)
+        except Exception as e:
+            print(f"Failed to clear message log: {str(e)}")
+        self._log_writes = 0
+
+    def _on_close(self):
+        """Flush pending state to disk before the window closes."""
+        if self._dirty or self._log_writes:
+            self._dirty = False
+            self._snapshot()
+        self.root.destroy()
+
     def _display_conversation(self, contact: str):
-        """Display conversation with the specified contact."""
-        self.chat_display.config(state='normal')
-        self.chat_display.delete(1.0, tk.END)
-        
-        if contact in self.messages:
-            for msg in sorted(self.messages[contact], key=lambda x: x.timestamp):
-                self._display_message(msg)
-        
-        self.chat_display.config(state='disabled')
+        """Display conversation with the specified contact.
+
+        If the conversation is already on screen, only the messages added
+        since the last render are appended; switching contacts rebuilds
+        the display.
+        """
+        msgs = self.messages.get(contact, [])
+        me = self.messenger.username
+
+        if contact == self._rendered_contact:
+            # Same conversation: append only the unrendered tail
+            start = self._rendered_count.get(contact, 0)
+            for msg in msgs[start:]:
+                self._display_message(msg, me)
+        else:
+            # Different conversation: rebuild from scratch (lists are
+            # already kept sorted by _insert_msg)
+            self.chat_display.config(state='normal')
+            self.chat_display.delete(1.0, tk.END)
+            self.chat_display.config(state='disabled')
+            for msg in msgs:
+                self._display_message(msg, me)
+
+        self._rendered_contact = contact
+        self._rendered_count[contact] = len(msgs)
         self.chat_display.see(tk.END)
     
-    def _display_message(self, msg: DirectMessage):
-        """Display a single message in the chat."""
+    def _fmt_time(self, timestamp: float) -> str:
+        """Format a timestamp for display, caching the result.
+
+        Re-rendering a conversation formats the same timestamps over and
+        over; the cache makes repeats a dict lookup.
+        """
+        time_str = self._time_cache.get(timestamp)
+        if time_str is None:
+            time_str = datetime.fromtimestamp(timestamp).strftime('%H:%M:%S')
+            self._time_cache[timestamp] = time_str
+        return time_str
+
+    def _display_message(self, msg: DirectMessage, me: Optional[str] = None):
+        """Display a single message in the chat.
+
+        ``me`` is the local username; callers rendering many messages
+        pass it in so it's only looked up once per batch.
+        """
+        if me is None:
+            me = self.messenger.username
+
         self.chat_display.config(state='normal')
-        
+
         # Format timestamp
-        time_str = datetime.fromtimestamp(msg.timestamp).strftime('%H:%M:%S')
-        
+        time_str = self._fmt_time(msg.timestamp)
+
         # Determine if it's an incoming or outgoing message
-        if msg.sender == self.messenger.username:
+        if msg.sender == me:
             # Outgoing message
             prefix = f"You ({time_str}):"
             tag = "outgoing"
@@ -230,9 +392,7 @@ class DirectMessengerGUI:
         
         # Insert message with appropriate tag
         self.chat_display.insert(tk.END, f"{prefix}\n{msg.message}\n\n", tag)
-        self.chat_display.tag_config("incoming", foreground="blue")
-        self.chat_display.tag_config("outgoing", foreground="green")
-        
+
         self.chat_display.config(state='disabled')
         self.chat_display.see(tk.END)
     
@@ -250,137 +410,248 @@ class DirectMessengerGUI:
         if not message:
             return
         
+        # Send on a worker thread and clear the input right away
+        recipient = self.current_contact
+        self.msg_entry.delete(0, tk.END)
+        future = self._io.submit(self.messenger.send, message, recipient)
+        future.add_done_callback(
+            lambda f: self.root.after(0, self._on_sent, f, message, recipient))
+
+    def _on_sent(self, future, message: str, recipient: str):
+        """Record a sent message once the server has acknowledged it."""
         try:
-            # Send the message
-            if self.messenger.send(message, self.current_contact):
+            if future.result():
                 # Create a DirectMessage object for local storage
                 msg = DirectMessage(
-                    recipient=self.current_contact,
+                    recipient=recipient,
                     sender=self.messenger.username,
                     message=message,
                     timestamp=time.time()
                 )
-                
-                # Add to messages
-                if self.current_contact not in self.messages:
-                    self.messages[self.current_contact] = []
-                self.messages[self.current_contact].append(msg)
-                
-                # Update display
-                self._display_message(msg)
-                
-                # Clear input
-                self.msg_entry.delete(0, tk.END)
-                
-                # Save data
-                self._save_data()
+
+                # Add to messages (persisted via the message log)
+                self._insert_msg(recipient, msg)
+
+                # Update display if the conversation is still open
+                if self.current_contact == recipient:
+                    self._display_conversation(recipient)
             else:
                 messagebox.showerror("Error", "Failed to send message")
-                
+
         except Exception as e:
             messagebox.showerror("Error", f"Failed to send message: {str(e)}")
     
     def _check_messages(self):
         """Periodically check for new messages."""
+        if self._fetch_inflight:
+            # A slow fetch is still running; don't start another
+            self.root.after(self._poll_ms, self._check_messages)
+            return
+
         if self.connected and self.messenger:
-            try:
-                # Check for new messages
-                new_messages = self.messenger.retrieve_new()
-                
-                # Process new messages
-                for msg in new_messages:
-                    sender = msg.sender
-                    if sender not in self.contacts:
-                        self.contacts.add(sender)
-                        self._update_contacts_list()
-                    
-                    if sender not in self.messages:
-                        self.messages[sender] = []
-                    
-                    # Add to messages if not already there
-                    if not any(m.timestamp == msg.timestamp and m.message == msg.message 
-                              for m in self.messages[sender]):
-                        self.messages[sender].append(msg)
-                        
-                        # If this is the current contact, display the message
-                        if self.current_contact == sender:
-                            self._display_message(msg)
-                
-                # Save updated messages
-                self._save_data()
-                
-            except Exception as e:
-                print(f"Error checking messages: {str(e)}")
-        
+            # Fetch on a worker thread so the UI stays responsive
+            self._fetch_inflight = True
+            future = self._io.submit(self.messenger.retrieve_new)
+            future.add_done_callback(
+                lambda f: self.root.after(0, self._apply_new, f))
+        else:
+            # Not logged in yet; just keep polling
+            self.root.after(self._poll_ms, self._check_messages)
+
+    def _apply_new(self, future):
+        """Integrate newly fetched messages on the Tk main thread."""
+        self._fetch_inflight = False
+        try:
+            new_messages = future.result()
+
+            # Poll quickly while messages are flowing, back off when idle
+            if new_messages:
+                self._poll_ms = 500
+            else:
+                self._poll_ms = min(self._poll_max, self._poll_ms * 2)
+
+            # Process new messages
+            for msg in new_messages:
+                sender = msg.sender
+                if sender not in self.contacts:
+                    self.contacts.add(sender)
+                    self._update_contacts_list()
+
+                # Add to messages if not already there
+                if (msg.timestamp, msg.message) not in self._msg_keys.get(sender, ()):
+                    self._insert_msg(sender, msg)
+
+                    # If this is the current contact, append it to the display
+                    if self.current_contact == sender:
+                        self._display_conversation(sender)
+
+        except Exception as e:
+            print(f"Error checking messages: {str(e)}")
+
         # Schedule the next check
-        self.root.after(5000, self._check_messages)
+        self.root.after(self._poll_ms, self._check_messages)
     
     def _save_data(self):
-        """Save contacts and messages to a file."""
+        """Schedule a debounced save of contacts and messages.
+
+        Marks the store dirty and coalesces rapid-fire saves into one
+        write at most a second later, instead of re-serializing the
+        whole history on every message.
+        """
+        self._dirty = True
+        if not self._flush_pending:
+            self._flush_pending = True
+            self.root.after(1000, self._flush_if_dirty)
+
+    def _flush_if_dirty(self):
+        """Write the store to disk if anything changed since the last flush."""
+        self._flush_pending = False
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._snapshot()
+
+    def _write_data(self):
+        """Serialize contacts and messages to disk atomically.
+
+        Messages are stored column-wise (schema 2): one array per field
+        instead of one dict per message, so field names aren't repeated
+        for every message and loading is a zip over arrays.
+        """
         data = {
+            'schema': 2,
             'contacts': list(self.contacts),
             'messages': {
-                contact: [
-                    {
-                        'recipient': msg.recipient,
-                        'sender': msg.sender,
-                        'message': msg.message,
-                        'timestamp': msg.timestamp
-                    }
-                    for msg in msgs
-                ]
+                contact: {
+                    'recipient': [msg.recipient for msg in msgs],
+                    'sender': [msg.sender for msg in msgs],
+                    'message': [msg.message for msg in msgs],
+                    'timestamp': [msg.timestamp for msg in msgs]
+                }
                 for contact, msgs in self.messages.items()
             }
         }
         
         try:
-            with open(self.data_file, 'w') as f:
-                json.dump(data, f)
+            # Write to a temp file then rename so a crash mid-write
+            # can't corrupt the store
+            tmp = self.data_file.with_name(self.data_file.name + '.tmp')
+            with open(tmp, 'wb') as f:
+                f.write(_dumps(data))
+            os.replace(tmp, self.data_file)
         except Exception as e:
             print(f"Failed to save data: {str(e)}")
     
     def _load_data(self):
-        """Load contacts and messages from a file."""
+        """Load contacts and messages from the snapshot and message log."""
         if not self.data_file.exists():
+            self._replay_log()
             return
-            
+
         try:
-            with open(self.data_file, 'r') as f:
-                data = json.load(f)
-                
+            with open(self.data_file, 'rb') as f:
+                data = _loads(f.read())
+
                 # Load contacts
                 self.contacts = set(data.get('contacts', []))
                 self._update_contacts_list()
                 
                 # Load messages
-                self.messages = {
-                    contact: [
-                        DirectMessage(
-                            recipient=msg['recipient'],
-                            sender=msg['sender'],
-                            message=msg['message'],
-                            timestamp=msg['timestamp']
-                        )
-                        for msg in msgs
-                    ]
-                    for contact, msgs in data.get('messages', {}).items()
+                if data.get('schema') == 2:
+                    # Columnar layout: zip the per-field arrays
+                    self.messages = {
+                        contact: [
+                            DirectMessage(recipient=r, sender=s,
+                                          message=m, timestamp=t)
+                            for r, s, m, t in zip(
+                                cols['recipient'], cols['sender'],
+                                cols['message'], cols['timestamp'])
+                        ]
+                        for contact, cols in data.get('messages', {}).items()
+                    }
+                else:
+                    # Legacy schema: one dict per message
+                    self.messages = {
+                        contact: [
+                            DirectMessage(
+                                recipient=msg['recipient'],
+                                sender=msg['sender'],
+                                message=msg['message'],
+                                timestamp=msg['timestamp']
+                            )
+                            for msg in msgs
+                        ]
+                        for contact, msgs in data.get('messages', {}).items()
+                    }
+
+                # Lists are kept sorted by timestamp from here on
+                for msgs in self.messages.values():
+                    msgs.sort(key=lambda m: m.timestamp)
+
+                # Rebuild the duplicate-check key sets
+                self._msg_keys = {
+                    contact: {(m.timestamp, m.message) for m in msgs}
+                    for contact, msgs in self.messages.items()
                 }
-                
+
         except Exception as e:
             print(f"Failed to load data: {str(e)}")
+
+        # Fold in any messages logged after the last snapshot
+        self._replay_log()
+
+    def _replay_log(self):
+        """Replay messages appended to the log since the last snapshot."""
+        if not self.log_file.exists():
+            return
+
+        try:
+            with open(self.log_file, 'r') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    entry = json.loads(line)
+                    contact = entry['contact']
+                    # A contact may exist only in the log (no snapshot
+                    # since the conversation started); restore it too,
+                    # or the replayed messages stay invisible and the
+                    # next snapshot drops the conversation entirely
+                    self.contacts.add(contact)
+                    if (entry['timestamp'], entry['message']) in \
+                            self._msg_keys.get(contact, ()):
+                        continue
+                    msg = DirectMessage(
+                        recipient=entry['recipient'],
+                        sender=entry['sender'],
+                        message=entry['message'],
+                        timestamp=entry['timestamp']
+                    )
+                    self._insert_msg(contact, msg, log=False)
+            self._update_contacts_list()
+        except Exception as e:
+            print(f"Failed to replay message log: {str(e)}")
     
     def _load_messages(self):
         """Load all messages from the server."""
         if not self.connected or not self.messenger:
             return
-        
+
+        # Fetch the full history on a worker thread
+        future = self._io.submit(self.messenger.retrieve_all)
+        future.add_done_callback(
+            lambda f: self.root.after(0, self._apply_all, f))
+
+    def _apply_all(self, future):
+        """Integrate the full message history on the Tk main thread."""
         try:
-            all_messages = self.messenger.retrieve_all()
-            
+            all_messages = future.result()
+            me = self.messenger.username
+
             # Process all messages
             for msg in all_messages:
                 # Determine the other party in the conversation
-                if msg.sender == self.messenger.username:
+                if msg.sender == me:
                     # Outgoing message
                     contact = msg.recipient
                 else:
@@ -388,14 +659,11 @@ class DirectMessengerGUI:
                     contact = msg.sender
                     self.contacts.add(contact)
                 
-                # Add to messages
-                if contact not in self.messages:
-                    self.messages[contact] = []
-                
-                # Add if not already in the list
-                if not any(m.timestamp == msg.timestamp and m.message == msg.message 
-                          for m in self.messages[contact]):
-                    self.messages[contact].append(msg)
+                # Add if not already in the list (one key-set lookup per
+                # message; _insert_msg maintains the same set)
+                keys = self._msg_keys.setdefault(contact, set())
+                if (msg.timestamp, msg.message) not in keys:
+                    self._insert_msg(contact, msg)
             
             # Update UI
             self._update_contacts_list()
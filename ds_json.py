@@ -0,0 +1,39 @@
+"""
+ds_json.py
+
+Shared JSON (de)serialization shim for the DSP client modules.
+
+Backends are layered by speed: orjson (fastest, parses str or bytes),
+then ujson (~3x stdlib, and available on platforms without orjson
+wheels such as musl or unusual ARM variants), then stdlib json as the
+last resort. Named ds_json rather than _json because a top-level _json
+module would shadow CPython's C accelerator for stdlib json.
+"""
+
+import json
+
+try:
+    import orjson
+
+    def dumps(obj) -> bytes:
+        """Serialize obj to JSON, returned as UTF-8 bytes."""
+        return orjson.dumps(obj)
+
+    loads = orjson.loads
+
+except ImportError:
+    try:
+        import ujson
+
+        def dumps(obj) -> bytes:
+            """Serialize obj to JSON, returned as UTF-8 bytes."""
+            return ujson.dumps(obj).encode('utf-8')
+
+        loads = ujson.loads
+
+    except ImportError:
+        def dumps(obj) -> bytes:
+            """Serialize obj to JSON, returned as UTF-8 bytes."""
+            return json.dumps(obj).encode('utf-8')
+
+        loads = json.loads
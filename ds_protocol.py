@@ -5,17 +5,53 @@ Implementation of the Direct Messaging Protocol for ICS 32 Assignment 3.
 """
 
 import json
-import time
-from collections import namedtuple
+import sys
+from time import time as _now
+from dataclasses import dataclass
 from typing import Dict, Any, Optional, List, Union
 
-# Create a namedtuple to hold the values we expect to retrieve from json messages.
-ServerResponse = namedtuple('ServerResponse', ['type', 'message', 'token', 'messages'])
+# Shared orjson-or-stdlib shim; accepts str or bytes
+from ds_json import loads as _loads
+
+
+@dataclass(slots=True, frozen=True)
+class ServerResponse:
+    """Holds the values we expect to retrieve from json messages.
+
+    A slotted dataclass rather than a namedtuple: one response is parsed
+    per server reply, and slot attribute reads skip the namedtuple's
+    Python-level property descriptors.
+    """
+    type: Optional[str]
+    message: str
+    token: Optional[str]
+    messages: List[Any]
 
 class DSPProtocolError(Exception):
     """Custom exception for DSP protocol related errors."""
     pass
 
+# The request payloads have a fixed shape, so instead of building a dict
+# and walking it with json.dumps per call, only the variable fields are
+# JSON-encoded (for correct escaping) and pasted into a template.
+_AUTH_TMPL = '{{"authenticate": {{"username": {}, "password": {}}}}}'
+_FETCH_TMPL = '{{"token": {}, "fetch": "{}"}}'
+# Uses 'message' rather than 'entry' to match the server's expectation
+_DM_TMPL = ('{{"token": {}, "directmessage": {{"message": {}, '
+            '"recipient": {}, "timestamp": {}}}}}')
+
+# Valid fetch arguments; frozenset gives a hashed O(1) membership test
+# with no per-call list allocation
+_VALID_FETCH = frozenset(('all', 'unread'))
+
+# Interned response keys: the parser interns its keys too, so these dict
+# lookups hit the pointer-equality fast path without comparing characters
+_K_RESPONSE = sys.intern('response')
+_K_TYPE = sys.intern('type')
+_K_MESSAGE = sys.intern('message')
+_K_TOKEN = sys.intern('token')
+_K_MESSAGES = sys.intern('messages')
+
 def format_auth_message(username: str, password: str) -> str:
     """
     Formats an authentication message to be sent to the server.
@@ -27,13 +63,7 @@ def format_auth_message(username: str, password: str) -> str:
     Returns:
         A JSON string representing the authentication message
     """
-    auth_msg = {
-        "authenticate": {
-            "username": username,
-            "password": password
-        }
-    }
-    return json.dumps(auth_msg)
+    return _AUTH_TMPL.format(json.dumps(username), json.dumps(password))
 
 def format_direct_message(token: str, recipient: str, message: str) -> str:
     """
@@ -47,15 +77,8 @@ def format_direct_message(token: str, recipient: str, message: str) -> str:
     Returns:
         A JSON string representing the direct message
     """
-    direct_msg = {
-        "token": token,
-        "directmessage": {
-            "message": message,  # Changed from 'entry' to 'message' to match server expectation
-            "recipient": recipient,
-            "timestamp": time.time()
-        }
-    }
-    return json.dumps(direct_msg)
+    return _DM_TMPL.format(json.dumps(token), json.dumps(message),
+                           json.dumps(recipient), _now())
 
 def format_fetch_request(token: str, fetch_type: str = 'all') -> str:
     """
@@ -68,14 +91,34 @@ def format_fetch_request(token: str, fetch_type: str = 'all') -> str:
     Returns:
         A JSON string representing the fetch request
     """
-    if fetch_type not in ['all', 'unread']:
+    if fetch_type not in _VALID_FETCH:
         raise DSPProtocolError("Invalid fetch type. Must be 'all' or 'unread'")
-    
-    fetch_msg = {
-        "token": token,
-        "fetch": fetch_type
-    }
-    return json.dumps(fetch_msg)
+
+    # fetch_type is validated above, so it needs no escaping
+    return _FETCH_TMPL.format(json.dumps(token), fetch_type)
+
+# Pre-split fetch payloads for the two valid fetch types. Tokens are
+# server-issued alphanumerics and dashes, so they need no JSON escaping
+# and can be concatenated straight between the precomputed halves.
+_FETCH_HEAD = '{"token": "'
+_FETCH_ALL_TAIL = '", "fetch": "all"}'
+_FETCH_UNREAD_TAIL = '", "fetch": "unread"}'
+
+def format_fetch_all(token: str) -> str:
+    """Fast path building the 'all' fetch request by concatenation.
+
+    Skips the validation and field encoding of format_fetch_request for
+    internal callers that always fetch 'all'.
+    """
+    return _FETCH_HEAD + token + _FETCH_ALL_TAIL
+
+def format_fetch_unread(token: str) -> str:
+    """Fast path building the 'unread' fetch request by concatenation.
+
+    Skips the validation and field encoding of format_fetch_request for
+    internal callers that always fetch 'unread'.
+    """
+    return _FETCH_HEAD + token + _FETCH_UNREAD_TAIL
 
 def extract_json(json_msg: str) -> ServerResponse:
     """
@@ -91,33 +134,41 @@ def extract_json(json_msg: str) -> ServerResponse:
         DSPProtocolError: If the JSON is invalid or missing required fields
     """
     try:
-        json_obj = json.loads(json_msg)
-        
-        # Check if response exists and has required fields
-        if 'response' not in json_obj:
-            raise DSPProtocolError("Invalid server response: missing 'response' field")
-            
-        response = json_obj['response']
-        
-        # Extract response type and message
-        resp_type = response.get('type')
-        message = response.get('message', '')
-        token = response.get('token')
-        
-        # Extract messages if they exist
-        messages = response.get('messages', [])
-        
-        return ServerResponse(
-            type=resp_type,
-            message=message,
-            token=token,
-            messages=messages
-        )
-        
-    except json.JSONDecodeError as e:
+        json_obj = _loads(json_msg)
+    except ValueError as e:
+        # Covers json.JSONDecodeError and orjson's decode error
         raise DSPProtocolError(f"Failed to decode JSON: {str(e)}")
-    except Exception as e:
-        raise DSPProtocolError(f"Error processing server response: {str(e)}")
+
+    # Check if response exists and has the expected shape
+    response = json_obj.get(_K_RESPONSE) if isinstance(json_obj, dict) else None
+    if not isinstance(response, dict):
+        raise DSPProtocolError("Invalid server response: missing 'response' field")
+
+    return ServerResponse(
+        type=response.get(_K_TYPE),
+        message=response.get(_K_MESSAGE, ''),
+        token=response.get(_K_TOKEN),
+        messages=response.get(_K_MESSAGES) or []
+    )
+
+def is_ok_fast(raw) -> bool:
+    """
+    Quickly check whether a raw response line reports success.
+
+    Scans the raw str/bytes for the ok type marker with a C-level
+    substring search instead of parsing the whole JSON object. Meant for
+    paths that only need the success bit (e.g. acknowledging a sent
+    message); use extract_json when the fields matter.
+
+    Args:
+        raw: The raw response line, as str or bytes
+
+    Returns:
+        bool: True if the response reports type ok
+    """
+    if isinstance(raw, bytes):
+        return b'"type": "ok"' in raw or b'"type":"ok"' in raw
+    return '"type": "ok"' in raw or '"type":"ok"' in raw
 
 def is_valid_response(response: ServerResponse) -> bool:
     """
@@ -77,142 +77,151 @@ class DSUServer:
         '''Handle requests from a single client'''
         current_user_token = None   
         self.clients.append(client_socket)
+        recv_buffer = b''
         try:
             while True:
                 data = client_socket.recv(4096)
                 if DEBUG:
                     print(f"Message received by server: {repr(data)}")
-                direct_message_read = False
-                direct_message_sent = False
-                msg = data.decode().strip() 
-                if not msg:
+                if not data:
                     if DEBUG:
                         print("Connection closed.")
                     break
-                try:
-                    command = json.loads(msg.strip())
-                except json.JSONDecodeError:
-                    message = 'Incorrectly formatted JSON message.'
-                    status = 'error'
-                else: 
-                    message = ""
-                    status = "error"
+                recv_buffer += data
+                ##Commands are newline-framed; one recv may carry several
+                ##pipelined commands (or a partial one), so answer each
+                ##completed line and keep the remainder buffered
+                while b'\n' in recv_buffer:
+                    raw_line, recv_buffer = recv_buffer.split(b'\n', 1)
+                    msg = raw_line.decode().strip()
+                    if not msg:
+                        continue
+                    direct_message_read = False
+                    direct_message_sent = False
+                    try:
+                        command = json.loads(msg.strip())
+                    except json.JSONDecodeError:
+                        message = 'Incorrectly formatted JSON message.'
+                        status = 'error'
+                    else: 
+                        message = ""
+                        status = "error"
                     
-                    if 'authenticate' in command:
+                        if 'authenticate' in command:
                         
-                        if len(command) != 1: 
-                            status = "error"
-                            message = "Incorrectly formatted authenticate command."
-                        elif len(command['authenticate']) > 2:
-                            status = "error"
-                            message = "Extra fields provided to authenticate command object."
-                        elif not all(field in command['authenticate'] for field in ['username', 'password']):
-                            status = "error"
-                            message = "Missing required fields for authenticate command object."
-                        elif current_user_token:
-                            status = "error"
-                            message = "User already authenticated on the active session."
-                        else:
-                            ##execute authenticate command
+                            if len(command) != 1: 
+                                status = "error"
+                                message = "Incorrectly formatted authenticate command."
+                            elif len(command['authenticate']) > 2:
+                                status = "error"
+                                message = "Extra fields provided to authenticate command object."
+                            elif not all(field in command['authenticate'] for field in ['username', 'password']):
+                                status = "error"
+                                message = "Missing required fields for authenticate command object."
+                            elif current_user_token:
+                                status = "error"
+                                message = "User already authenticated on the active session."
+                            else:
+                                ##execute authenticate command
                             
-                            uname = command['authenticate']['username']
-                            password = command['authenticate']['password']
+                                uname = command['authenticate']['username']
+                                password = command['authenticate']['password']
                             
                             
-                            fetched_user = self._get_or_create_new_user(uname, password)
+                                fetched_user = self._get_or_create_new_user(uname, password)
 
-                            current_user_token = generate_token()
-                            if not fetched_user:
-                                message = f'Welcome to ICS32 Distributed Social, {uname}!'
-                                status = 'ok'
-                                self.sessions[current_user_token] = uname
+                                current_user_token = generate_token()
+                                if not fetched_user:
+                                    message = f'Welcome to ICS32 Distributed Social, {uname}!'
+                                    status = 'ok'
+                                    self.sessions[current_user_token] = uname
 
                                 
-                            else:
-                                if fetched_user['password'] != password:
-                                    status = "error"
-                                    message = f'Incorrect password for the user {uname}'
-                                    current_user_token = None
-                                    
                                 else:
-                                    status = "ok"
-                                    message = f'Welcome back, {uname}!'
-                                    self.sessions[current_user_token] = uname
+                                    if fetched_user['password'] != password:
+                                        status = "error"
+                                        message = f'Incorrect password for the user {uname}'
+                                        current_user_token = None
+                                    
+                                    else:
+                                        status = "ok"
+                                        message = f'Welcome back, {uname}!'
+                                        self.sessions[current_user_token] = uname
                     
-                    ###direct message handling
-                    elif 'directmessage' in command:
-                        if 'token' not in command:
-                            message = 'Missing token.'
-                            status = 'error'
-                        elif len(command) != 2:
-                            message = "Incorrectly formatted directmessage command."
-                            status = 'error'
-                        else:
-                            dm_data = command['directmessage']
-                            if not isinstance(dm_data, dict) or 'recipient' not in dm_data or 'message' not in dm_data:
-                                message = "Missing required fields for direct message (recipient, message)."
+                        ###direct message handling
+                        elif 'directmessage' in command:
+                            if 'token' not in command:
+                                message = 'Missing token.'
+                                status = 'error'
+                            elif len(command) != 2:
+                                message = "Incorrectly formatted directmessage command."
                                 status = 'error'
                             else:
-                                token = command['token']
-                                if token == current_user_token and token in self.sessions:
-                                    current_user = self.sessions[token]
-                                    recipient = dm_data['recipient']
-                                    # Make sure we're using the correct field name
-                                    message_content = dm_data.get('message') or dm_data.get('entry', '')
-                                    timestamp = str(datetime.now().timestamp())
-                                    direct_message_sent = True
+                                dm_data = command['directmessage']
+                                if not isinstance(dm_data, dict) or 'recipient' not in dm_data or 'message' not in dm_data:
+                                    message = "Missing required fields for direct message (recipient, message)."
+                                    status = 'error'
+                                else:
+                                    token = command['token']
+                                    if token == current_user_token and token in self.sessions:
+                                        current_user = self.sessions[token]
+                                        recipient = dm_data['recipient']
+                                        # Make sure we're using the correct field name
+                                        message_content = dm_data.get('message') or dm_data.get('entry', '')
+                                        timestamp = str(datetime.now().timestamp())
+                                        direct_message_sent = True
                                     
-                                    if self._send_message(message_content, current_user, recipient, timestamp):
-                                        message = 'Direct message sent'
-                                        status = 'ok'
+                                        if self._send_message(message_content, current_user, recipient, timestamp):
+                                            message = 'Direct message sent'
+                                            status = 'ok'
+                                        else:
+                                            message = 'Unable to send direct message. Recipient may not exist.'
+                                            status = 'error'
                                     else:
-                                        message = 'Unable to send direct message. Recipient may not exist.'
+                                        message = 'Invalid user token.'
                                         status = 'error'
+                            
+                        elif 'fetch' in command:
+                            args = command['fetch']
+                            token = command['token']
+                            if args == 'all':
+                                if token == current_user_token and token in self.sessions:
+                                    current_user = self.sessions[token]
+                                    direct_message_read = True
+                                    message = self._read_all_messages(current_user)
+                                    status = 'ok'
                                 else:
-                                    message = 'Invalid user token.'
+                                    message = f'Invalid user token.'
                                     status = 'error'
-                            
-                    elif 'fetch' in command:
-                        args = command['fetch']
-                        token = command['token']
-                        if args == 'all':
-                            if token == current_user_token and token in self.sessions:
-                                current_user = self.sessions[token]
-                                direct_message_read = True
-                                message = self._read_all_messages(current_user)
-                                status = 'ok'
-                            else:
-                                message = f'Invalid user token.'
-                                status = 'error'
-                        elif args == 'unread':
-                            if token == current_user_token and token in self.sessions:
-                                current_user = self.sessions[token]
-                                direct_message_read = True
-                                message = self._read_unread_messages(current_user)
-                                status = 'ok'
+                            elif args == 'unread':
+                                if token == current_user_token and token in self.sessions:
+                                    current_user = self.sessions[token]
+                                    direct_message_read = True
+                                    message = self._read_unread_messages(current_user)
+                                    status = 'ok'
+                                else:
+                                    message = f'Invalid user token.'
+                                    status = 'error'
+
                             else:
-                                message = f'Invalid user token.'
+                                message = 'Invalid argument for fetch field.'
                                 status = 'error'
 
                         else:
-                            message = 'Invalid argument for fetch field.'
+                            message = 'Invalid command.'
                             status = 'error'
-
+                    if DEBUG:
+                        print(f'Server sending the following message: "{message}"')
+                    if direct_message_read:
+                        resp = {'response': {'type':status, 'messages': message} }
+                    elif direct_message_sent:
+                        resp = {'response': {'type':status, 'message': message} }
+                    elif status == 'ok':
+                        resp = {'response': {'type':status, 'message': message, 'token': current_user_token} }
                     else:
-                        message = 'Invalid command.'
-                        status = 'error'
-                if DEBUG:
-                    print(f'Server sending the following message: "{message}"')
-                if direct_message_read:
-                    resp = {'response': {'type':status, 'messages': message} }
-                elif direct_message_sent:
-                    resp = {'response': {'type':status, 'message': message} }
-                elif status == 'ok':
-                    resp = {'response': {'type':status, 'message': message, 'token': current_user_token} }
-                else:
-                    resp = {'response': {'type':status, 'message': message}}
-                json_response = json.dumps(resp).encode()
-                client_socket.sendall(json_response + b'\r\n')
+                        resp = {'response': {'type':status, 'message': message}}
+                    json_response = json.dumps(resp).encode()
+                    client_socket.sendall(json_response + b'\r\n')
             if current_user_token and current_user_token in self.sessions:
                 del self.sessions[current_user_token]
         except Exception as e:
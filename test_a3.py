@@ -0,0 +1,150 @@
+import unittest
+import json
+import tempfile
+from pathlib import Path
+from a3 import DirectMessengerGUI
+from ds_messenger import DirectMessage
+
+
+def make_app(tmp_path: Path) -> DirectMessengerGUI:
+    """Build a GUI instance with only its persistence state, no Tk.
+
+    __init__ needs a Tk root, so the object is created bare and just the
+    attributes the load/save/log paths touch are filled in; the contacts
+    tree refresh is stubbed out.
+    """
+    app = DirectMessengerGUI.__new__(DirectMessengerGUI)
+    app.messages = {}
+    app._msg_keys = {}
+    app.contacts = set()
+    app._tree_contacts = set()
+    app.data_file = tmp_path / 'messenger_data.json'
+    app.log_file = tmp_path / 'messenger_data.jsonl'
+    app._log_f = None
+    app._log_writes = 0
+    app._dirty = False
+    app._flush_pending = False
+    app._rendered_contact = None
+    app._rendered_count = {}
+    app._update_contacts_list = lambda: None
+    return app
+
+
+class TestPersistence(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.tmp_path = Path(self.tmp.name)
+        self.app = make_app(self.tmp_path)
+
+    def tearDown(self):
+        if self.app._log_f is not None:
+            self.app._log_f.close()
+        self.tmp.cleanup()
+
+    def test_snapshot_roundtrip(self):
+        """Test that a schema-2 snapshot loads back identically"""
+        self.app.contacts.add("bob")
+        self.app._insert_msg("bob", DirectMessage(
+            recipient="bob", sender="me", message="hi", timestamp=1.0),
+            log=False)
+        self.app._write_data()
+
+        loaded = make_app(self.tmp_path)
+        loaded._load_data()
+        self.assertEqual(loaded.contacts, {"bob"})
+        self.assertEqual(len(loaded.messages["bob"]), 1)
+        msg = loaded.messages["bob"][0]
+        self.assertEqual(msg.message, "hi")
+        self.assertEqual(msg.sender, "me")
+        self.assertEqual(msg.timestamp, 1.0)
+        # Duplicate-check keys are rebuilt from the loaded messages
+        self.assertIn((1.0, "hi"), loaded._msg_keys["bob"])
+
+    def test_legacy_schema_load(self):
+        """Test that a pre-schema-2 store still loads"""
+        legacy = {
+            'contacts': ["alice"],
+            'messages': {
+                "alice": [{
+                    'recipient': "me", 'sender': "alice",
+                    'message': "hello", 'timestamp': 2.0
+                }]
+            }
+        }
+        self.app.data_file.write_text(json.dumps(legacy))
+        self.app._load_data()
+        self.assertEqual(self.app.contacts, {"alice"})
+        self.assertEqual(self.app.messages["alice"][0].message, "hello")
+
+    def test_log_replay_restores_messages_and_contacts(self):
+        """Test that log-only conversations survive an unclean exit"""
+        # Log a message without ever snapshotting (no data_file on disk)
+        self.app.contacts.add("bob")
+        self.app._insert_msg("bob", DirectMessage(
+            recipient="bob", sender="me", message="hi", timestamp=1.0))
+        self.app._log_f.close()
+        self.app._log_f = None
+
+        loaded = make_app(self.tmp_path)
+        loaded._load_data()
+        self.assertEqual(len(loaded.messages["bob"]), 1)
+        self.assertEqual(loaded.messages["bob"][0].message, "hi")
+        # The replayed contact must be restored too, or the next
+        # snapshot would drop the conversation
+        self.assertIn("bob", loaded.contacts)
+
+    def test_replay_skips_messages_in_snapshot(self):
+        """Test that replay ignores log entries the snapshot already has"""
+        self.app.contacts.add("bob")
+        self.app._insert_msg("bob", DirectMessage(
+            recipient="bob", sender="me", message="hi", timestamp=1.0))
+        self.app._write_data()  # snapshot without truncating the log
+        self.app._log_f.close()
+        self.app._log_f = None
+
+        loaded = make_app(self.tmp_path)
+        loaded._load_data()
+        self.assertEqual(len(loaded.messages["bob"]), 1)
+
+    def test_non_tail_insert_invalidates_render(self):
+        """Test that a mid-list insert forces a display rebuild"""
+        self.app._insert_msg("bob", DirectMessage(
+            recipient="bob", sender="me", message="first", timestamp=10.0),
+            log=False)
+        self.app._insert_msg("bob", DirectMessage(
+            recipient="bob", sender="me", message="second", timestamp=20.0),
+            log=False)
+        # Pretend both messages are already on screen
+        self.app._rendered_contact = "bob"
+        self.app._rendered_count["bob"] = 2
+
+        # A tail insert keeps the append-only render path valid
+        self.app._insert_msg("bob", DirectMessage(
+            recipient="bob", sender="me", message="third", timestamp=30.0),
+            log=False)
+        self.assertEqual(self.app._rendered_contact, "bob")
+
+        # An older timestamp lands below the rendered tail and must
+        # invalidate the rendered state so the display rebuilds
+        self.app._rendered_count["bob"] = 3
+        self.app._insert_msg("bob", DirectMessage(
+            recipient="me", sender="bob", message="late", timestamp=15.0),
+            log=False)
+        self.assertIsNone(self.app._rendered_contact)
+        self.assertEqual(
+            [m.message for m in self.app.messages["bob"]],
+            ["first", "late", "second", "third"])
+
+    def test_snapshot_truncates_log(self):
+        """Test that snapshotting folds the log into the store"""
+        self.app.contacts.add("bob")
+        self.app._insert_msg("bob", DirectMessage(
+            recipient="bob", sender="me", message="hi", timestamp=1.0))
+        self.app._snapshot()
+        self.assertTrue(self.app.data_file.exists())
+        self.assertEqual(self.app.log_file.stat().st_size, 0)
+        self.assertEqual(self.app._log_writes, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,8 +4,11 @@ from ds_protocol import (
     format_auth_message,
     format_direct_message,
     format_fetch_request,
+    format_fetch_all,
+    format_fetch_unread,
     extract_json,
     is_valid_response,
+    is_ok_fast,
     DSPProtocolError
 )
 
@@ -46,6 +49,29 @@ class TestDSProtocol(unittest.TestCase):
         with self.assertRaises(DSPProtocolError):
             format_fetch_request(token, 'invalid')
 
+    def test_format_fetch_fast_paths(self):
+        """Test fast fetch builders match format_fetch_request output"""
+        token = "test-token"
+        self.assertEqual(format_fetch_all(token),
+                         format_fetch_request(token, 'all'))
+        self.assertEqual(format_fetch_unread(token),
+                         format_fetch_request(token, 'unread'))
+
+    def test_is_ok_fast(self):
+        """Test the substring success check on str and bytes responses"""
+        spaced = '{"response": {"type": "ok", "message": "Message sent"}}'
+        compact = '{"response":{"type":"ok"}}'
+        error = '{"response": {"type": "error", "message": "Bad token"}}'
+
+        self.assertTrue(is_ok_fast(spaced))
+        self.assertTrue(is_ok_fast(compact))
+        self.assertFalse(is_ok_fast(error))
+
+        # Bytes responses straight off the socket work the same way
+        self.assertTrue(is_ok_fast(spaced.encode('utf-8')))
+        self.assertTrue(is_ok_fast(compact.encode('utf-8')))
+        self.assertFalse(is_ok_fast(error.encode('utf-8')))
+
     def test_extract_json_valid(self):
         """Test extracting valid JSON response"""
         test_json = '''
@@ -133,5 +133,58 @@ class TestDirectMessenger(unittest.TestCase):
         self.assertEqual(parsed[1].sender, "user2")
         self.assertEqual(parsed[1].recipient, "user2")
 
+    def test_send_async_returns_future(self):
+        """Test that send_async resolves its Future off the main thread"""
+        self.messenger._authenticate = Mock(return_value=True)
+        self.messenger.token = "test-token"
+
+        future = self.messenger.send_async("Hello", "recipient")
+        self.assertTrue(future.result(timeout=5))
+
+    def test_send_async_fails_without_connection(self):
+        """Test that send_async resolves False when auth fails"""
+        self.messenger._authenticate = Mock(return_value=False)
+
+        future = self.messenger.send_async("Hello", "recipient")
+        self.assertFalse(future.result(timeout=5))
+
+    def test_parse_messages_seen_filters_repeats(self):
+        """Test that a shared seen set makes repeated parses novel-only"""
+        test_messages = [
+            {"message": "Hello", "from": "user1", "timestamp": 1234567890.0}
+        ]
+        seen = set()
+
+        first = self.messenger._parse_messages(test_messages, seen=seen)
+        second = self.messenger._parse_messages(test_messages, seen=seen)
+
+        # The retrieve paths pass a per-instance seen set, so a message
+        # is only ever returned by the first fetch that sees it
+        self.assertEqual(len(first), 1)
+        self.assertEqual(second, [])
+
+    def test_ensure_connected_resets_stale_socket(self):
+        """Test that a dead socket is torn down before re-authenticating"""
+        # Simulate the state after the server closed the connection: the
+        # socket object still exists but the reader marked us disconnected
+        self.messenger.socket = Mock()
+        self.messenger.connected = False
+        self.messenger.token = None
+        self.messenger._reset_connection = Mock()
+        self.messenger._authenticate = Mock(return_value=True)
+
+        self.assertTrue(self.messenger._ensure_connected())
+        self.messenger._reset_connection.assert_called_once()
+        self.messenger._authenticate.assert_called_once()
+
+    def test_ensure_connected_reuses_live_session(self):
+        """Test that a live authenticated session is reused as-is"""
+        self.messenger.connected = True
+        self.messenger.token = "test-token"
+        self.messenger._authenticate = Mock()
+
+        self.assertTrue(self.messenger._ensure_connected())
+        self.messenger._authenticate.assert_not_called()
+
 if __name__ == '__main__':
     unittest.main()